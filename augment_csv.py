@@ -1,46 +1,125 @@
 import os
 import csv
+import asyncio
 import argparse
-from typing import Dict, Any
+import itertools
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
 
 from sra_tissue_classifier import (
-	fetch_sra_xml_for_srx,
-	extract_metadata_from_sra_xml,
-	try_fetch_biosample_json,
+	fetch_sra_metadata_for_srx,
+	fetch_sra_metadata_batch,
+	enrich_metadata_from_biosample,
 	build_prompt,
-	call_gemini,
-	srx_link,
+	call_gemini_async,
+	classification_result,
 )
 
+# Write and flush the output CSV in batches of this many rows
+FLUSH_EVERY = 50
+# Schedule at most this many x --gemini-concurrency rows ahead of the writer
+SCHEDULE_AHEAD = 4
 
-def classify_row(srx: str, api_key: str) -> Dict[str, Any]:
-	"""Classify a single SRX and return outputs, raising on network errors."""
-	sra_xml = fetch_sra_xml_for_srx(srx)
-	meta = extract_metadata_from_sra_xml(sra_xml)
+
+def fetch_meta(srx: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+	"""Fetch and enrich SRA/BioSample metadata for one SRX (NCBI stage).
+
+	If prefetched SRA metadata is given, the SRA efetch round-trip is skipped.
+	"""
+	if meta is None:
+		meta = fetch_sra_metadata_for_srx(srx)
 	if not meta:
 		raise RuntimeError("Missing metadata")
+	return enrich_metadata_from_biosample(meta)
+
+
+async def classify_meta_async(srx: str, meta: Dict[str, Any], api_key: str) -> Dict[str, Any]:
+	"""Classify already-fetched metadata with Gemini (Gemini stage)."""
+	resp = await call_gemini_async(build_prompt(meta), api_key)
+	return classification_result(srx, meta, resp)
+
+
+def fetch_meta_safe(srx: str, meta: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+	"""Like fetch_meta, but returns None instead of raising."""
+	if not srx:
+		return None
+	try:
+		return fetch_meta(srx, meta)
+	except Exception:
+		return None
+
+
+async def classify_srx_async(
+	srx: str,
+	prefetched: Optional[Dict[str, Any]],
+	api_key: str,
+	ncbi_ex: ThreadPoolExecutor,
+	gemini_sem: asyncio.Semaphore,
+) -> Dict[str, Any]:
+	"""Run both pipeline stages for one SRX, returning an empty dict on any error.
+
+	The blocking NCBI stage runs on ``ncbi_ex`` (its size bounds NCBI concurrency);
+	the Gemini stage runs on the event loop, gated by ``gemini_sem``.
+	"""
+	loop = asyncio.get_running_loop()
+	meta = await loop.run_in_executor(ncbi_ex, fetch_meta_safe, srx, prefetched)
+	if not meta:
+		return {}
+	try:
+		async with gemini_sem:
+			return await classify_meta_async(srx, meta, api_key)
+	except Exception:
+		return {}
+
+
+async def _pipeline(args, srx_list, prefetched, augmented_fields, new_cols) -> int:
+	"""Classify rows concurrently and stream them to the output CSV.
 
-	biosample_json = try_fetch_biosample_json(meta.get("biosample"))
-	if biosample_json:
-		try:
-			bs = biosample_json
-			parts = []
-			for k in ("organism", "isolation_source", "tissue", "cell_type", "cell_line"):
-				v = bs.get(k)
-				if isinstance(v, str) and v:
-					parts.append(f"{k}: {v}")
-			if parts:
-				meta["metadata_text"] += "\n" + "\n".join(parts)
-		except Exception:
-			pass
-
-	prompt = build_prompt(meta)
-	resp = call_gemini(prompt, api_key)
-	return {
-		"srx_link": srx_link(meta.get("srx") or srx),
-		"summary_5_words": resp.get("summary_5_words", ""),
-		"tissue_guess": resp.get("tissue_guess", ""),
-	}
+	Input rows are re-read lazily and tasks are scheduled at most
+	SCHEDULE_AHEAD x --gemini-concurrency rows ahead of the write cursor, so only
+	a bounded window of rows and results is held in memory. Rows are written in
+	input order, in batches of FLUSH_EVERY that are flushed immediately, so an
+	interrupted run still leaves a valid partial CSV. Returns the row count.
+	"""
+	gemini_sem = asyncio.Semaphore(args.gemini_concurrency)
+	window = max(1, SCHEDULE_AHEAD * args.gemini_concurrency)
+	# Duplicate SRXs (e.g. technical replicates) are classified once and the
+	# result is broadcast to every matching row; it is dropped after the last one
+	remaining = collections.Counter(s for s in srx_list if s)
+	tasks: Dict[str, asyncio.Future] = {}
+	scheduled = 0
+
+	with ThreadPoolExecutor(max_workers=args.ncbi_workers) as ncbi_ex, \
+			open(args.input, newline="") as infile, \
+			open(args.output, "w", newline="", buffering=1 << 16) as outfile:
+		writer = csv.DictWriter(outfile, fieldnames=augmented_fields)
+		writer.writeheader()
+		buf = []
+		n = 0
+		for n, (row, srx) in enumerate(zip(csv.DictReader(infile), srx_list), start=1):
+			while scheduled < min(n - 1 + window, len(srx_list)):
+				s = srx_list[scheduled]
+				scheduled += 1
+				if s and s not in tasks:
+					meta = prefetched.pop(s, None)
+					tasks[s] = asyncio.ensure_future(classify_srx_async(s, meta, args.api_key, ncbi_ex, gemini_sem))
+			# DictReader rows are private dicts, so augment them in place
+			if srx:
+				row.update(await tasks[srx])
+				remaining[srx] -= 1
+				if not remaining[srx]:
+					del tasks[srx]
+			# On any error, leave new columns empty
+			for c in new_cols:
+				row.setdefault(c, "")
+			buf.append(row)
+			if len(buf) == FLUSH_EVERY:
+				writer.writerows(buf)
+				buf.clear()
+				outfile.flush()
+		writer.writerows(buf)
+	return n
 
 
 def main() -> None:
@@ -48,6 +127,8 @@ def main() -> None:
 	parser.add_argument("--input", default="other_samples_predictions.csv", help="Input CSV path")
 	parser.add_argument("--output", default="other_samples_predictions_augmented_first20.csv", help="Output CSV path")
 	parser.add_argument("--limit", type=int, default=20, help="Number of rows to process from start")
+	parser.add_argument("--ncbi-workers", type=int, default=10, help="Concurrent NCBI metadata fetches")
+	parser.add_argument("--gemini-concurrency", type=int, default=20, help="Concurrent Gemini calls")
 	parser.add_argument("--api-key", dest="api_key", default=os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY"), help="Gemini API key")
 	args = parser.parse_args()
 
@@ -59,31 +140,21 @@ def main() -> None:
 		fieldnames = list(reader.fieldnames or [])
 		first_col = fieldnames[0] if fieldnames else None
 		new_cols = ["srx_link", "summary_5_words", "tissue_guess"]
-		augmented_fields = fieldnames + [c for c in new_cols if c not in fieldnames]
-
-		rows_out = []
-		for i, row in enumerate(reader, start=1):
-			if i > args.limit:
-				break
-			srx = (row.get(first_col) or "").strip() if first_col else ""
-			out = {**row}
-			try:
-				if srx:
-					res = classify_row(srx, args.api_key)
-					out.update(res)
-			except Exception:
-				# On any error, leave new columns empty and continue
-				for c in new_cols:
-					out.setdefault(c, "")
-			rows_out.append(out)
-
-	with open(args.output, "w", newline="") as outfile:
-		writer = csv.DictWriter(outfile, fieldnames=augmented_fields)
-		writer.writeheader()
-		for r in rows_out:
-			writer.writerow(r)
+		augmented_fields = list(dict.fromkeys(fieldnames + new_cols))
+
+		# Only accessions are read up front (the batched prefetch needs them);
+		# full rows are streamed again by _pipeline
+		srx_list = [
+			(row.get(first_col) or "").strip() if first_col else ""
+			for row in itertools.islice(reader, max(args.limit, 0))
+		]
 
-	print(f"Wrote {len(rows_out)} rows to {args.output}")
+	# Prefetch SRA metadata in a few batched efetch calls; rows missing from the
+	# batch (including those in a failed chunk) fall back to a per-SRX fetch
+	# inside fetch_meta
+	prefetched = fetch_sra_metadata_batch([s for s in dict.fromkeys(srx_list) if s])
+	written = asyncio.run(_pipeline(args, srx_list, prefetched, augmented_fields, new_cols))
+	print(f"Wrote {written} rows to {args.output}")
 
 
 if __name__ == "__main__":
@@ -1,29 +1,297 @@
 import os
 import sys
+import asyncio
+import time
+import threading
+import collections
+import functools
+import hashlib
 import argparse
 import json
-from typing import Any, Dict, Optional
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
 
 import requests
-import xmltodict
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Optional import of Gemini; we handle ImportError gracefully with a helpful message
 try:
 	import google.generativeai as genai
+	from google.api_core import exceptions as google_exceptions
 except ImportError:  # pragma: no cover
 	genai = None
+	google_exceptions = None
+
+# Optional persistent HTTP cache; without it every run re-fetches from NCBI
+try:
+	import requests_cache
+except ImportError:  # pragma: no cover
+	requests_cache = None
+
+# Optional faster JSON parsing on the hot path; falls back to the stdlib
+try:
+	import orjson
+except ImportError:  # pragma: no cover
+	orjson = None
+
+
+def _json_loads(data):
+	"""Parse JSON from bytes or str, using orjson when available."""
+	if orjson is not None:
+		return orjson.loads(data)
+	return json.loads(data)
 
 
 NCBI_EUTILS_BASE = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+NCBI_API_KEY = os.environ.get("NCBI_API_KEY")
+NCBI_EMAIL = os.environ.get("NCBI_EMAIL")
+NCBI_TOOL = "SRAScrape"
+HTTP_CACHE_PATH = os.environ.get("SRA_CACHE_PATH", ".sra_cache.sqlite")
+HTTP_CACHE_EXPIRE = timedelta(days=30)
+META_CACHE_DIR = Path(os.environ.get("SRA_META_CACHE_DIR", ".cache/meta"))
+GEMINI_CACHE_DIR = Path(os.environ.get("GEMINI_CACHE_DIR", ".cache/gemini"))
+GEMINI_MODEL = "gemini-1.5-flash"
+GEMINI_ATTEMPTS = 5
+
+
+class RateLimiter:
+	"""Sliding-window limiter allowing at most ``rps`` acquisitions per second across threads."""
+
+	def __init__(self, rps: int):
+		self.rps = rps
+		self.lock = threading.Lock()
+		self.times = collections.deque()
+
+	def acquire(self) -> None:
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				while self.times and now - self.times[0] >= 1.0:
+					self.times.popleft()
+				if len(self.times) < self.rps:
+					self.times.append(now)
+					return
+				wait = 1.0 - (now - self.times[0])
+			time.sleep(wait)
+
+
+# NCBI allows 3 req/s without an API key and 10 req/s with one
+_NCBI_LIMITER = RateLimiter(10 if NCBI_API_KEY else 3)
+
+
+class _RateLimitedRetry(Retry):
+	"""urllib3 Retry that also waits on a RateLimiter before every retry attempt.
+
+	urllib3 retries inside HTTPAdapter.send, below the adapter's own acquire(),
+	so without this hook retries after a 429/5xx would bypass the limiter.
+	"""
+
+	def __init__(self, *args, limiter: Optional[RateLimiter] = None, **kwargs):
+		self.limiter = limiter
+		super().__init__(*args, **kwargs)
+
+	def new(self, **kw):
+		retry = super().new(**kw)
+		retry.limiter = self.limiter
+		return retry
+
+	def sleep(self, response=None):
+		super().sleep(response)
+		if self.limiter is not None:
+			self.limiter.acquire()
+
+
+class _RateLimitedAdapter(HTTPAdapter):
+	"""HTTPAdapter that waits on a RateLimiter before each request hits the network.
+
+	Cached responses never reach the adapter, so they do not consume rate budget.
+	Pair it with a _RateLimitedRetry on the same limiter so retries are shaped too.
+	"""
+
+	def __init__(self, limiter: RateLimiter, **kwargs):
+		self.limiter = limiter
+		super().__init__(**kwargs)
+
+	def send(self, request, **kwargs):
+		self.limiter.acquire()
+		return super().send(request, **kwargs)
+
+
+def _make_session() -> requests.Session:
+	"""Build a pooled session so repeated NCBI calls reuse Keep-Alive connections.
+
+	When requests-cache is installed, successful responses are also persisted
+	to an SQLite cache so re-runs skip the network for previously seen accessions.
+	"""
+	if requests_cache is not None:
+		session = requests_cache.CachedSession(
+			HTTP_CACHE_PATH,
+			expire_after=HTTP_CACHE_EXPIRE,
+			allowable_codes=(200,),
+			allowable_methods=("GET", "HEAD", "POST"),
+		)
+	else:
+		session = requests.Session()
+	adapter = _RateLimitedAdapter(
+		_NCBI_LIMITER,
+		pool_connections=16,
+		pool_maxsize=32,
+		max_retries=_RateLimitedRetry(
+			limiter=_NCBI_LIMITER,
+			total=5,
+			backoff_factor=1.0,
+			status_forcelist=(429, 500, 502, 503, 504),
+			respect_retry_after_header=True,
+			allowed_methods=("GET", "POST"),
+		),
+	)
+	session.mount("https://", adapter)
+	return session
+
+
+_SESSION = _make_session()
+
+
+def _eutils_params(params: Dict[str, Any]) -> Dict[str, Any]:
+	"""Add tool/email/api_key identification to E-utilities request params."""
+	params = dict(params, tool=NCBI_TOOL)
+	if NCBI_EMAIL:
+		params["email"] = NCBI_EMAIL
+	if NCBI_API_KEY:
+		params["api_key"] = NCBI_API_KEY
+	return params
+
+
+def fetch_sra_xml_for_srx(srx_accession: str) -> bytes:
+	"""Fetch raw SRA efetch XML for a given SRX accession.
+
+	The body is returned as undecoded bytes: lxml honours the XML declaration's
+	encoding itself, so decoding to ``str`` first would only add a copy.
+	"""
+	url = f"{NCBI_EUTILS_BASE}/efetch.fcgi"
+	params = _eutils_params({"db": "sra", "id": srx_accession, "retmode": "xml"})
+	resp = _SESSION.get(url, params=params, timeout=30)
+	resp.raise_for_status()
+	return resp.content
 
 
-def fetch_sra_xml_for_srx(srx_accession: str) -> Dict[str, Any]:
-	"""Fetch SRA XML metadata for a given SRX accession and return as dict."""
+def _fetch_sra_xml_ids(srx_accessions: List[str]) -> bytes:
+	"""POST one efetch for a list of accessions and return the raw XML bytes."""
 	url = f"{NCBI_EUTILS_BASE}/efetch.fcgi"
-	params = {"db": "sra", "id": srx_accession, "retmode": "xml"}
-	resp = requests.get(url, params=params, timeout=30)
+	# POST keeps long id lists clear of URL length limits
+	data = _eutils_params({"db": "sra", "id": ",".join(srx_accessions), "retmode": "xml"})
+	resp = _SESSION.post(url, data=data, timeout=60)
 	resp.raise_for_status()
-	return xmltodict.parse(resp.text)
+	return resp.content
+
+
+def fetch_sra_metadata_batch(srx_accessions: List[str], chunk: int = 200) -> Dict[str, Dict[str, Any]]:
+	"""Fetch and extract metadata for many SRX accessions via batched efetch.
+
+	Returns a mapping of experiment accession -> metadata dict (see
+	extract_metadata_from_sra_xml). Accessions already in the metadata cache are
+	not sent to NCBI. Accessions NCBI did not return, or whose chunk failed, are
+	absent; metadata from successful chunks is always kept.
+	"""
+	metas: Dict[str, Dict[str, Any]] = {}
+	missing = []
+	for srx in srx_accessions:
+		hit = _cached_metadata(srx)
+		if hit is not None:
+			metas[srx] = hit
+		else:
+			missing.append(srx)
+	for start in range(0, len(missing), chunk):
+		try:
+			xml_bytes = _fetch_sra_xml_ids(missing[start:start + chunk])
+			chunk_metas = list(extract_metadata_stream(xml_bytes))
+		except Exception:
+			continue
+		for meta in chunk_metas:
+			if meta.get("srx"):
+				_store_metadata(meta["srx"], meta)
+				metas[meta["srx"]] = dict(meta)
+	return metas
+
+
+def fetch_sra_metadata_for_srx(srx_accession: str) -> Dict[str, Any]:
+	"""Fetch and extract metadata for a single SRX (see extract_metadata_from_sra_xml)."""
+	hit = _cached_metadata(srx_accession)
+	if hit is not None:
+		return hit
+	meta = extract_metadata_from_sra_xml(fetch_sra_xml_for_srx(srx_accession))
+	if meta:
+		_store_metadata(srx_accession, meta)
+		if meta.get("srx") and meta["srx"] != srx_accession:
+			_store_metadata(meta["srx"], meta)
+	return meta
+
+
+def _disk_cache_get(cache_dir: Path, key: str, max_age: Optional[timedelta] = None) -> Any:
+	"""Return the JSON value cached under ``cache_dir/key.json``, or None.
+
+	Entries whose file is older than ``max_age`` are treated as missing.
+	"""
+	path = cache_dir / f"{key}.json"
+	try:
+		if max_age is not None and time.time() - path.stat().st_mtime > max_age.total_seconds():
+			return None
+		return _json_loads(path.read_bytes())
+	except (OSError, ValueError):
+		return None
+
+
+def _disk_cache_set(cache_dir: Path, key: str, value: Any) -> None:
+	"""Atomically write ``value`` as JSON to ``cache_dir/key.json``; errors are ignored."""
+	path = cache_dir / f"{key}.json"
+	try:
+		cache_dir.mkdir(parents=True, exist_ok=True)
+		tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+		tmp.write_text(json.dumps(value))
+		os.replace(tmp, path)
+	except OSError:
+		pass
+
+
+# Bump whenever _extract_package's output changes, so metadata cached by an
+# older extractor is not served (entries otherwise live for HTTP_CACHE_EXPIRE)
+META_EXTRACTOR_VERSION = 3
+_META_MEMO: Dict[str, Dict[str, Any]] = {}
+
+
+def _meta_cache_dir() -> Path:
+	return META_CACHE_DIR / f"v{META_EXTRACTOR_VERSION}"
+
+
+def _cached_metadata(srx_accession: str) -> Optional[Dict[str, Any]]:
+	"""Return extracted metadata cached for an accession, or None.
+
+	Looks in-process first, then in JSON under META_CACHE_DIR; on-disk entries
+	expire after HTTP_CACHE_EXPIRE. Callers get a shallow copy and may mutate
+	it freely.
+	"""
+	meta = _META_MEMO.get(srx_accession)
+	if meta is None:
+		if not srx_accession.isalnum():
+			return None
+		# Same lifetime as the HTTP cache, so upstream annotation fixes are picked up
+		meta = _disk_cache_get(_meta_cache_dir(), srx_accession, max_age=HTTP_CACHE_EXPIRE)
+		if meta is None:
+			return None
+		_META_MEMO[srx_accession] = meta
+	return dict(meta)
+
+
+def _store_metadata(srx_accession: str, meta: Dict[str, Any]) -> None:
+	"""Cache extracted metadata for an accession in-process and on disk."""
+	_META_MEMO[srx_accession] = dict(meta)
+	# Accessions double as file names, so anything unusual stays in-process only
+	if srx_accession.isalnum():
+		_disk_cache_set(_meta_cache_dir(), srx_accession, meta)
 
 
 def get_first(item_or_list):
@@ -32,51 +300,69 @@ def get_first(item_or_list):
 	return item_or_list
 
 
-def extract_metadata_from_sra_xml(sra_xml: Dict[str, Any]) -> Dict[str, Any]:
-	"""Extract useful metadata fields from SRA efetch XML structure.
+def extract_metadata_from_sra_xml(xml_bytes: bytes) -> Dict[str, Any]:
+	"""Extract useful metadata fields from SRA efetch XML.
 
 	Returns a dict containing keys like: srx, srs, biosample, sample_title, study_title,
 	tissue, cell_type, organism, attributes, and a compact text blob of metadata_text.
+	Only the first EXPERIMENT_PACKAGE is used; an empty dict is returned if there is none.
+	"""
+	return next(extract_metadata_stream(xml_bytes), {})
+
+
+def extract_metadata_stream(xml_bytes: bytes) -> Iterator[Dict[str, Any]]:
+	"""Stream metadata dicts, one per EXPERIMENT_PACKAGE, out of SRA efetch XML.
+
+	Each package element is freed once extracted, so large batched responses
+	are handled in a single pass without building the whole tree.
+	"""
+	for _, pkg in etree.iterparse(BytesIO(xml_bytes), events=("end",), tag="EXPERIMENT_PACKAGE"):
+		yield _extract_package(pkg)
+		pkg.clear()
+		while pkg.getprevious() is not None:
+			del pkg.getparent()[0]
+
+
+# Field lookups relative to an EXPERIMENT_PACKAGE, compiled once at import.
+# string(...) yields "" for missing nodes, normalised to None by _clean;
+# plain strings avoid keeping references back into the (cleared) tree.
+_X_SRX = etree.XPath("string(EXPERIMENT/@accession)", smart_strings=False)
+_X_SRS = etree.XPath("string(SAMPLE/@accession)", smart_strings=False)
+_X_BIOSAMPLE = etree.XPath('string(SAMPLE/IDENTIFIERS/EXTERNAL_ID[@namespace="BioSample"])', smart_strings=False)
+_X_SAMPLE_TITLE = etree.XPath("string(SAMPLE/TITLE)", smart_strings=False)
+_X_STUDY_TITLE = etree.XPath("string(STUDY/DESCRIPTOR/STUDY_TITLE)", smart_strings=False)
+_X_STUDY_ABSTRACT = etree.XPath("string(STUDY/DESCRIPTOR/STUDY_ABSTRACT)", smart_strings=False)
+_X_ORGANISM = etree.XPath("string(SAMPLE/SAMPLE_NAME/SCIENTIFIC_NAME)", smart_strings=False)
+_X_ATTRS = etree.XPath("SAMPLE/SAMPLE_ATTRIBUTES/SAMPLE_ATTRIBUTE")
+
+
+def _clean(text: Optional[str]) -> Optional[str]:
+	"""Strip surrounding whitespace like xmltodict did; empty or blank text becomes None."""
+	if text is None:
+		return None
+	return text.strip() or None
+
+
+def _extract_package(pkg) -> Dict[str, Any]:
+	"""Extract metadata from a single EXPERIMENT_PACKAGE element.
+
+	Results are cached on disk per accession: bump META_EXTRACTOR_VERSION whenever
+	the returned fields or metadata_text change, or stale entries will be served.
 	"""
-	pkg = sra_xml.get("EXPERIMENT_PACKAGE_SET", {}).get("EXPERIMENT_PACKAGE")
-	if isinstance(pkg, list):
-		pkg = pkg[0]
-	if not pkg:
-		return {}
-
-	experiment = pkg.get("EXPERIMENT", {})
-	sample = pkg.get("SAMPLE", {})
-	study = pkg.get("STUDY", {})
-
-	srx = experiment.get("@accession")
-	srs = sample.get("@accession")
-
-	# BioSample from sample identifiers
-	biosample = None
-	identifiers = sample.get("IDENTIFIERS", {})
-	external_ids = identifiers.get("EXTERNAL_ID")
-	if external_ids:
-		external_ids_list = external_ids if isinstance(external_ids, list) else [external_ids]
-		for ex in external_ids_list:
-			if ex.get("@namespace") == "BioSample":
-				biosample = ex.get("#text")
-				break
-
-	sample_title = sample.get("TITLE")
-	study_title = study.get("DESCRIPTOR", {}).get("STUDY_TITLE")
-	study_abstract = study.get("DESCRIPTOR", {}).get("STUDY_ABSTRACT")
-
-	# Organism
-	sample_name = sample.get("SAMPLE_NAME", {})
-	organism = sample_name.get("SCIENTIFIC_NAME")
-
-	# Attributes
+	srx = _clean(_X_SRX(pkg))
+	srs = _clean(_X_SRS(pkg))
+	biosample = _clean(_X_BIOSAMPLE(pkg))
+	sample_title = _clean(_X_SAMPLE_TITLE(pkg))
+	study_title = _clean(_X_STUDY_TITLE(pkg))
+	study_abstract = _clean(_X_STUDY_ABSTRACT(pkg))
+	organism = _clean(_X_ORGANISM(pkg))
+
+	# Attributes (repeated tags keep their first position and last value)
 	attrs = {}
-	for attr in (sample.get("SAMPLE_ATTRIBUTES", {}) or {}).get("SAMPLE_ATTRIBUTE", []) or []:
-		tag = attr.get("TAG")
-		val = attr.get("VALUE")
+	for attr in _X_ATTRS(pkg):
+		tag = _clean(attr.findtext("TAG"))
 		if tag:
-			attrs[tag.lower()] = val
+			attrs[tag.lower()] = _clean(attr.findtext("VALUE"))
 
 	tissue = attrs.get("tissue") or attrs.get("tissue_type")
 	cell_type = attrs.get("cell_type") or attrs.get("celltype")
@@ -92,8 +378,7 @@ def extract_metadata_from_sra_xml(sra_xml: Dict[str, Any]) -> Dict[str, Any]:
 		parts.append(f"Sample title: {sample_title}")
 	if organism:
 		parts.append(f"Organism: {organism}")
-	for k, v in attrs.items():
-		parts.append(f"{k}: {v}")
+	parts.extend(f"{k}: {v}" for k, v in attrs.items())
 	metadata_text = "\n".join(parts)
 
 	return {
@@ -119,14 +404,39 @@ def try_fetch_biosample_json(biosample_accession: Optional[str]) -> Optional[Dic
 	# BioSample E-utilities esummary is not perfect; use NCBI BioSample API JSON if available
 	url = f"https://api.ncbi.nlm.nih.gov/datasets/v2alpha/biosample/accession/{biosample_accession}"
 	try:
-		resp = requests.get(url, timeout=30)
+		resp = _SESSION.get(url, timeout=30)
 		if resp.status_code == 200:
-			return resp.json()
+			return _json_loads(resp.content)
 	except Exception:
 		return None
 	return None
 
 
+def enrich_metadata_from_biosample(meta: Dict[str, Any]) -> Dict[str, Any]:
+	"""Append BioSample fields to ``meta["metadata_text"]`` in place and return ``meta``.
+
+	Skipped when the SRA attributes already name a tissue, cell type or cell line,
+	which saves a BioSample round-trip for well-annotated samples.
+	"""
+	if meta.get("tissue") or meta.get("cell_type") or meta.get("cell_line"):
+		return meta
+	biosample_json = try_fetch_biosample_json(meta.get("biosample"))
+	if biosample_json:
+		# This structure can vary; we will not rely on exact shape but try a few common fields
+		try:
+			bs = biosample_json
+			text_parts = []
+			for k in ("organism", "isolation_source", "tissue", "cell_type", "cell_line"):
+				v = bs.get(k)
+				if isinstance(v, str) and v:
+					text_parts.append(f"{k}: {v}")
+			if text_parts:
+				meta["metadata_text"] += "\n" + "\n".join(text_parts)
+		except Exception:
+			pass
+	return meta
+
+
 CANONICAL_TISSUES = [
 	"adipose", "adrenal gland", "artery", "blood", "bone marrow", "brain",
 	"breast", "cervix", "colon", "esophagus", "eye", "fallopian tube",
@@ -155,39 +465,136 @@ def build_prompt(metadata: Dict[str, Any]) -> str:
 	return prompt
 
 
-def call_gemini(prompt: str, api_key: str) -> Dict[str, str]:
+# Constrain Gemini to the JSON object we parse, so no prose recovery is needed
+GEMINI_GENERATION_CONFIG = {
+	"response_mime_type": "application/json",
+	"response_schema": {
+		"type": "object",
+		"properties": {
+			"summary_5_words": {"type": "string"},
+			"tissue_guess": {"type": "string"},
+		},
+		"required": ["summary_5_words", "tissue_guess"],
+	},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _gemini_model(api_key: str):
+	"""Configure Gemini once per API key and reuse the model across calls."""
 	if genai is None:
 		raise RuntimeError(
 			"google-generativeai is not installed. Please install dependencies from requirements.txt"
 		)
 	genai.configure(api_key=api_key)
-	model = genai.GenerativeModel("gemini-1.5-flash")
-	resp = model.generate_content(prompt)
-	text = resp.text or ""
-	# Parse JSON (no semantic postprocessing)
-	data: Dict[str, str]
+	return genai.GenerativeModel(GEMINI_MODEL, generation_config=GEMINI_GENERATION_CONFIG)
+
+
+def _parse_gemini_text(text: str) -> Dict[str, str]:
+	# The response schema makes Gemini emit bare JSON; unparseable output yields empty fields
 	try:
-		data = json.loads(text)
-	except Exception:
-		start = text.find("{")
-		end = text.rfind("}")
-		if start != -1 and end != -1 and end > start:
-			try:
-				data = json.loads(text[start:end + 1])
-			except Exception:
-				data = {"summary_5_words": "", "tissue_guess": ""}
-		else:
-			data = {"summary_5_words": "", "tissue_guess": ""}
-	# Return as-is without trimming or normalization
+		data = _json_loads(text.encode())
+	except ValueError:
+		data = {}
 	summary = (data.get("summary_5_words") or "").strip()
 	tissue_guess = (data.get("tissue_guess") or "").strip()
 	return {"summary_5_words": summary, "tissue_guess": tissue_guess}
 
 
+def _gemini_cache_key(prompt: str) -> str:
+	return hashlib.blake2b(f"{GEMINI_MODEL}\n{prompt}".encode(), digest_size=16).hexdigest()
+
+
+def _gemini_cache_get(key: str) -> Optional[Dict[str, str]]:
+	return _disk_cache_get(GEMINI_CACHE_DIR, key)
+
+
+def _gemini_cache_store(key: str, text: str) -> Dict[str, str]:
+	"""Parse a Gemini response and cache it if usable."""
+	result = _parse_gemini_text(text)
+	# Only cache usable answers so failed parses are retried on the next run
+	if result["summary_5_words"] or result["tissue_guess"]:
+		_disk_cache_set(GEMINI_CACHE_DIR, key, result)
+	return result
+
+
+def _gemini_backoff(attempt: int, exc: Exception) -> Optional[float]:
+	"""Seconds to wait before retrying a failed Gemini call, or None to give up.
+
+	Only transient errors are retried (429 ResourceExhausted, 500
+	InternalServerError, 503 ServiceUnavailable, 504 DeadlineExceeded), up to
+	GEMINI_ATTEMPTS attempts in total.
+	"""
+	if google_exceptions is None or attempt >= GEMINI_ATTEMPTS - 1:
+		return None
+	transient = (
+		google_exceptions.ResourceExhausted,
+		google_exceptions.InternalServerError,
+		google_exceptions.ServiceUnavailable,
+		google_exceptions.DeadlineExceeded,
+	)
+	if not isinstance(exc, transient):
+		return None
+	return 2 ** attempt
+
+
+def call_gemini(prompt: str, api_key: str) -> Dict[str, str]:
+	key = _gemini_cache_key(prompt)
+	hit = _gemini_cache_get(key)
+	if hit is not None:
+		return hit
+	model = _gemini_model(api_key)
+	attempt = 0
+	while True:
+		try:
+			resp = model.generate_content(prompt)
+			break
+		except Exception as exc:
+			delay = _gemini_backoff(attempt, exc)
+			if delay is None:
+				raise
+			time.sleep(delay)
+			attempt += 1
+	return _gemini_cache_store(key, resp.text or "")
+
+
+async def call_gemini_async(prompt: str, api_key: str) -> Dict[str, str]:
+	"""Async variant of call_gemini; many prompts can share one event loop.
+
+	Cache file I/O runs in a worker thread so it does not block the loop.
+	"""
+	key = _gemini_cache_key(prompt)
+	hit = await asyncio.to_thread(_gemini_cache_get, key)
+	if hit is not None:
+		return hit
+	model = _gemini_model(api_key)
+	attempt = 0
+	while True:
+		try:
+			resp = await model.generate_content_async(prompt)
+			break
+		except Exception as exc:
+			delay = _gemini_backoff(attempt, exc)
+			if delay is None:
+				raise
+			await asyncio.sleep(delay)
+			attempt += 1
+	return await asyncio.to_thread(_gemini_cache_store, key, resp.text or "")
+
+
 def srx_link(srx: str) -> str:
 	return f"https://www.ncbi.nlm.nih.gov/sra/?term={srx}"
 
 
+def classification_result(srx: str, meta: Dict[str, Any], gemini: Dict[str, str]) -> Dict[str, str]:
+	"""Assemble the output columns for one SRX from its metadata and Gemini answer."""
+	return {
+		"srx_link": srx_link(meta.get("srx") or srx),
+		"summary_5_words": gemini.get("summary_5_words", ""),
+		"tissue_guess": gemini.get("tissue_guess", ""),
+	}
+
+
 def main() -> None:
 	parser = argparse.ArgumentParser(description="Classify tissue for scRNA-seq SRX accessions")
 	parser.add_argument("srx", help="SRX accession, e.g., SRX22288182")
@@ -204,37 +611,18 @@ def main() -> None:
 		sys.exit(2)
 
 	# Fetch SRA metadata
-	sra_xml = fetch_sra_xml_for_srx(args.srx)
-	meta = extract_metadata_from_sra_xml(sra_xml)
+	meta = fetch_sra_metadata_for_srx(args.srx)
 	if not meta:
 		print("Error: Could not retrieve SRA metadata for the given SRX.", file=sys.stderr)
 		sys.exit(1)
 
 	# Optionally enrich from BioSample
-	biosample_json = try_fetch_biosample_json(meta.get("biosample"))
-	if biosample_json:
-		# Try to pull extra attributes if present
-		try:
-			# This structure can vary; we will not rely on exact shape but try a few common fields
-			bs = biosample_json
-			text_parts = []
-			for k in ("organism", "isolation_source", "tissue", "cell_type", "cell_line"):
-				v = bs.get(k)
-				if isinstance(v, str) and v:
-					text_parts.append(f"{k}: {v}")
-			if text_parts:
-				meta["metadata_text"] += "\n" + "\n".join(text_parts)
-		except Exception:
-			pass
+	enrich_metadata_from_biosample(meta)
 
 	prompt = build_prompt(meta)
 	gemini = call_gemini(prompt, args.api_key)
 
-	print(json.dumps({
-		"srx_link": srx_link(meta.get("srx") or args.srx),
-		"summary_5_words": gemini.get("summary_5_words"),
-		"tissue_guess": gemini.get("tissue_guess"),
-	}, indent=2))
+	print(json.dumps(classification_result(args.srx, meta, gemini), indent=2))
 
 
 if __name__ == "__main__":